@@ -1,3 +1,4 @@
+import os
 from osgeo import gdal
 import rasterio
 from rasterio.enums import Resampling
@@ -19,6 +20,11 @@ def exportGeoserverDEM(self, file_ds, file):
     kwargs = {
         'format': 'GTiff',
         'multithread': True,
+        # multithread:True alone only overlaps I/O and compute; this
+        # parallelizes the resampling kernel itself
+        'warpOptions': ['NUM_THREADS=ALL_CPUS'],
+        'warpMemoryLimit': h.getWarpMemoryLimit(file_ds),
+        'creationOptions': ['NUM_THREADS=ALL_CPUS', 'TILED=YES', 'BIGTIFF=IF_SAFER'],
         'xRes': 0.3,
         'yRes': 0.3,
         # force 'none' to fix old error in Drone Deploy exports (https://gdal.org/programs/gdal_translate.html#cmdoption-gdal_translate-a_nodata)
@@ -38,7 +44,9 @@ def exportGeoserverDEM(self, file_ds, file):
         print(
             f'-> Transforming EPSG:{self.epsg} to EPSG:{params.geoserver_epsg}')
 
-    tmpWarp = TEMP_FOLDER + "\\geoserverWarp.tif"
+    # per-file name: workers processing other files share the temp folder
+    tmpWarp = os.path.join(
+        TEMP_FOLDER, f'{self.outputFilename}_geoserverWarp.tif')
 
     # Use the warp to convert projections, change the GSD and correct the noData values
     file_ds = gdal.Warp(tmpWarp, file_ds, **kwargs)
@@ -59,24 +67,37 @@ def _exportFloat(self, file_ds, outputFilename):
     gdaloutputDEM = f'{params.geoserverDEM["output_folder"]}/{outputFilename}'
 
     kwargs = {
-        'format': 'GTiff',
         'bandList': [1],
         'xRes': params.geoserverDEM['gsd']/100,
         'yRes': params.geoserverDEM['gsd']/100,
-        'creationOptions': [
-            'TFW=NO',
-            'TILED=YES',
-            'PHOTOMETRIC=MINISBLACK',
-            'COMPRESS=DEFLATE',
-        ],
         'metadataOptions': self.extra_metadata,
         # to fix old error in Drone Deploy exports (https://gdal.org/programs/gdal_translate.html#cmdoption-gdal_translate-a_nodata)
         'noData': 'none' if self.hasAlphaChannel else params.no_data
     }
 
+    if (params.use_cog):
+        kwargs['format'] = 'COG'
+        kwargs['creationOptions'] = [
+            'COMPRESS=DEFLATE',
+            'PREDICTOR=3',  # floating point predictor
+            'BLOCKSIZE=512',
+            'NUM_THREADS=ALL_CPUS',
+            'BIGTIFF=IF_SAFER',
+            'OVERVIEWS=AUTO' if params.geoserverDEM['overviews'] else 'OVERVIEWS=NONE',
+        ]
+    else:
+        kwargs['format'] = 'GTiff'
+        kwargs['creationOptions'] = [
+            'TFW=NO',
+            'TILED=YES',
+            'PHOTOMETRIC=MINISBLACK',
+            'COMPRESS=DEFLATE',
+        ]
+
     file_ds = gdal.Translate(gdaloutputDEM, file_ds, **kwargs)
 
-    if (params.geoserverDEM['overviews']):
+    # the COG driver already built its internal overviews
+    if (params.geoserverDEM['overviews'] and not params.use_cog):
         h.addOverviews(file_ds)
 
     file_ds = None
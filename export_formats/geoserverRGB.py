@@ -1,7 +1,8 @@
+import os
 from osgeo import gdal
 
 from export_formats.outlines import exportOutline
-from helpers import addOverviews
+from helpers import addOverviews, getWarpMemoryLimit
 import params as params
 
 TEMP_FOLDER = params.tmp_folder
@@ -18,6 +19,11 @@ def exportGeoserverRGB(self, file_ds, file):
         'xRes': params.geoserverRGB['gsd']/100,
         'yRes': params.geoserverRGB['gsd']/100,
         'multithread': True,
+        # multithread:True alone only overlaps I/O and compute; this
+        # parallelizes the resampling kernel itself
+        'warpOptions': ['NUM_THREADS=ALL_CPUS'],
+        'warpMemoryLimit': getWarpMemoryLimit(file_ds),
+        'creationOptions': ['NUM_THREADS=ALL_CPUS', 'TILED=YES', 'BIGTIFF=IF_SAFER'],
         # force 'none' to fix old error in Drone Deploy exports (https://gdal.org/programs/gdal_translate.html#cmdoption-gdal_translate-a_nodata)
         'srcNodata': 'none' if self.hasAlphaChannel else self.noDataValue
     }
@@ -38,7 +44,9 @@ def exportGeoserverRGB(self, file_ds, file):
             f'-> Transforming EPSG:{self.epsg} to EPSG:{params.geoserver_epsg}')
 
     if (warp):
-        tmpWarp = TEMP_FOLDER + "\\geoserverWarp.tif"
+        # per-file name: workers processing other files share the temp folder
+        tmpWarp = os.path.join(
+            TEMP_FOLDER, f'{self.outputFilename}_geoserverWarp.tif')
         file_ds = gdal.Warp(tmpWarp, file_ds, **kwargs)
 
     if (params.geoserverRGB['outlines']['enabled']):
@@ -49,17 +57,7 @@ def exportGeoserverRGB(self, file_ds, file):
     gdaloutput = f'{params.geoserverRGB["output_folder"]}/{outputFilename}'
 
     kwargs = {
-        'format': 'GTiff',
         'bandList': [1, 2, 3],
-        'creationOptions': [
-            'JPEG_QUALITY=80',
-            'BIGTIFF=IF_NEEDED',  # for files larger than 4 GB
-            'TFW=NO',
-            'TILED=YES',  # forces the creation of a tiled output GeoTiff with default parameters
-            'PHOTOMETRIC=YCBCR',  # switches the photometric interpretation to the yCbCr color space, which allows a significant further reduction in output size with minimal changes on the images
-            'COMPRESS=JPEG',
-            # 'PROFILE=GeoTIFF' # Only GeoTIFF tags will be added to the baseline
-        ],
         'maskBand': 4,
         'xRes': params.geoserverRGB['gsd']/100,
         'yRes': params.geoserverRGB['gsd']/100,
@@ -68,9 +66,33 @@ def exportGeoserverRGB(self, file_ds, file):
         'noData': 'none' if self.hasAlphaChannel else params.no_data,
     }
 
+    if (params.use_cog):
+        # jpeg COGs are YCbCr-interleaved and tiled by the driver itself
+        kwargs['format'] = 'COG'
+        kwargs['creationOptions'] = [
+            'COMPRESS=JPEG',
+            'QUALITY=80',
+            'BLOCKSIZE=512',
+            'NUM_THREADS=ALL_CPUS',
+            'BIGTIFF=IF_SAFER',
+            'OVERVIEWS=AUTO' if params.geoserverRGB['overviews'] else 'OVERVIEWS=NONE',
+        ]
+    else:
+        kwargs['format'] = 'GTiff'
+        kwargs['creationOptions'] = [
+            'JPEG_QUALITY=80',
+            'BIGTIFF=IF_NEEDED',  # for files larger than 4 GB
+            'TFW=NO',
+            'TILED=YES',  # forces the creation of a tiled output GeoTiff with default parameters
+            'PHOTOMETRIC=YCBCR',  # switches the photometric interpretation to the yCbCr color space, which allows a significant further reduction in output size with minimal changes on the images
+            'COMPRESS=JPEG',
+            # 'PROFILE=GeoTIFF' # Only GeoTIFF tags will be added to the baseline
+        ]
+
     file_ds = gdal.Translate(gdaloutput, file_ds, **kwargs)
 
-    if (params.geoserverRGB['overviews']):
+    # the COG driver already built its internal overviews
+    if (params.geoserverRGB['overviews'] and not params.use_cog):
         addOverviews(file_ds)
 
     file_ds = None
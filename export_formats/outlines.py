@@ -2,8 +2,6 @@ import os
 from osgeo import gdal, osr, ogr
 import params as params
 
-TEMP_FOLDER = params.tmp_folder
-
 
 def exportOutline(self, file_ds):
     '''
@@ -22,24 +20,18 @@ def exportOutline(self, file_ds):
     if res != 0:
         raise RuntimeError(repr(res) + ': EPSG not found')
 
-    tmpFilename = f'{self.outputFilename}{params.outline_suffix}.geojson'
-
-    # Temporary vector file
-    tmpGdaloutput = TEMP_FOLDER + "\\" + tmpFilename
-
-    if os.path.exists(tmpGdaloutput):
-        geoDriver.DeleteDataSource(tmpGdaloutput)
-
-    tmpOutDatasource = geoDriver.CreateDataSource(tmpGdaloutput)
+    # Polygonize straight into an in-memory layer; going through a temp
+    # GeoJSON cost serializing and re-parsing every polygon
+    memDriver = ogr.GetDriverByName('Memory')
+    memDatasource = memDriver.CreateDataSource('')
 
-    outLayer = tmpOutDatasource.CreateLayer("outline", srs=srs)
+    memLayer = memDatasource.CreateLayer(
+        "outline", srs=srs, geom_type=ogr.wkbPolygon)
 
     maskBand = file_ds.GetRasterBand(4)
 
     # Create the outline based on the alpha channel
-    gdal.Polygonize(maskBand, maskBand, outLayer, -1, [], callback=None)
-
-    tmpOutDatasource = None
+    gdal.Polygonize(maskBand, maskBand, memLayer, -1, [], callback=None)
 
     if os.path.exists(gdaloutput):
         geoDriver.DeleteDataSource(gdaloutput)
@@ -50,12 +42,9 @@ def exportOutline(self, file_ds):
     layer = outDatasource.CreateLayer(
         "outline", srs=srs, geom_type=ogr.wkbPolygon)
 
-    shp = ogr.Open(tmpGdaloutput, 0)
-    tmp_layer = shp.GetLayer()
-
     biggerGeoms = []
 
-    for feature in tmp_layer:
+    for feature in memLayer:
         geom = feature.geometry()
         area = geom.GetArea()
 
@@ -65,7 +54,7 @@ def exportOutline(self, file_ds):
             # Clone to prevent multiiple GDAL bugs
             biggerGeoms.append(geom.Clone())
 
-    tmp_layer = None
+    memDatasource = None
     geom = None
 
     # Convert mutiples Polygons to an unique MultiPolygon
@@ -1,16 +1,22 @@
 import os
+import functools
 from osgeo import gdal
-from PIL import Image, ImageEnhance, ImageColor
-from osgeo_utils.gdal_calc import Calc
+from PIL import ImageColor
+import numpy as np
 
 import params as params
 
 
-def exportStoragePreview(self, geotiff):
+@functools.lru_cache(maxsize=None)
+def getRGBPalette(palette):
+    '''
+    Parse the hex palette only once per run, instead of on every DEM
+    '''
+    return [' '.join(map(str, ImageColor.getcolor(x, 'RGB')))
+            for x in palette]
 
-    # temporary disable the "auxiliary metadata" because JPG doesn't support it,
-    # so this creates an extra file that we don't need (...aux.xml)
-    gdal.SetConfigOption('GDAL_PAM_ENABLED', 'NO')
+
+def exportStoragePreview(self, geotiff):
 
     outputPreviewFilename = f'{self.outputFilename}{params.preview_suffix}.jpg'
 
@@ -38,35 +44,31 @@ def exportStoragePreview(self, geotiff):
         }
     )
 
-    # reenable the internal metadata
-    gdal.SetConfigOption('GDAL_PAM_ENABLED', 'YES')
+    if (self.isDEM):
+        # release the in-memory colored hillshade
+        gdal.Unlink(geotiff)
 
 
 def getColoredHillshade(self, geotiff):
     '''
     Create a colored hillshade result from merging hillshade / DEM
     '''
-    tmpColorRelief = f'{params.tmp_folder}\\colorRelief.tif'
-    tmpHillshade = f'{params.tmp_folder}\\hillshade.tif'
-    tmpGammaHillshade = f'{params.tmp_folder}\\gammaHillshade.tif'
-    tmpColoredHillshade = f'{params.tmp_folder}\\coloredHillshade.tif'
-    tmpColoredHillshadeContrast = f'{params.tmp_folder}\\coloredHillshadeC.tif'
-    tmpFileColorPath = f'{params.tmp_folder}\\colorPalette.txt'
-
+    # in-memory rasters, to skip the disk write + read of each intermediate
+    tmpColorRelief = '/vsimem/colorRelief.tif'
+    tmpHillshade = '/vsimem/hillshade.tif'
+    tmpColoredHillshadeContrast = '/vsimem/coloredHillshadeC.tif'
+    # per-file name: another DEM worker writing its palette at the same
+    # time would otherwise recolor this preview with its breakpoints
+    tmpFileColorPath = os.path.join(
+        params.tmp_folder, f'{self.outputFilename}_colorPalette.txt')
+
+    rgbPalette = getRGBPalette(tuple(params.styleDEM['palette']))
+
+    # Write palette file to be imported in gdal, merging two structures.
+    # Built in memory and flushed in a single write
     fileColor = open(tmpFileColorPath, 'w')
-
-    rgbPalette = [' '.join(map(str, ImageColor.getcolor(x, 'RGB')))
-                  for x in params.styleDEM['palette']]
-
-    # Write palette file to be imported in gdal
-    i = 0
-    while i < len(params.styleDEM['palette']):
-        # Generating a color palette merging two structures
-        mergeColor = str(self.colorValues[i]) + ' ' + \
-            str(rgbPalette[i])
-        fileColor.write(mergeColor + '\n')
-        i += 1
-
+    fileColor.write('\n'.join(f'{colorValue} {rgb}' for colorValue,
+                    rgb in zip(self.colorValues, rgbPalette)) + '\n')
     fileColor.close()
 
     # Using gdaldem to generate color-Relief and hillshade https://gdal.org/programs/gdaldem.html
@@ -74,46 +76,59 @@ def getColoredHillshade(self, geotiff):
         tmpColorRelief,
         geotiff,
         **{
-            'format': 'JPEG',
+            # lossless intermediate: jpeg would cost a DCT encode + decode
+            # and leak quantization noise into the blend math
+            'format': 'GTiff',
+            'creationOptions': ['TILED=YES', 'COMPRESS=LZW', 'PREDICTOR=2'],
             'colorFilename': tmpFileColorPath,
             'processing': 'color-relief'
         }
     )
 
+    os.remove(tmpFileColorPath)
+
     gdal.DEMProcessing(
         tmpHillshade,
         geotiff,
         **{
-            'format': 'JPEG',
+            'format': 'GTiff',
+            'creationOptions': ['TILED=YES', 'COMPRESS=LZW', 'PREDICTOR=2'],
             'processing': 'hillshade',
             'azimuth': '90',
             'zFactor': '5'
         }
     )
 
-    # Adjust hillshade gamma values
-    Calc(["uint8(((A/255)*(0.5))*255)"],
-         A=tmpHillshade,
-         outfile=tmpGammaHillshade,
-         overwrite=True
-         )
-
-    # Merge hillshade and color
-    Calc(["uint8( ( \
-                2 * (A/255.)*(B/255.)*(A<128) + \
-                ( 1 - 2 * (1-(A/255.))*(1-(B/255.)) ) * (A>=128) \
-            ) * 255 )"],
-         A=tmpGammaHillshade,
-         B=tmpColorRelief,
-         outfile=tmpColoredHillshade,
-         allBands="B",
-         overwrite=True
-         )
-
-    im = Image.open(tmpColoredHillshade)
-    enhancer = ImageEnhance.Contrast(im)
+    # Adjust the hillshade gamma and "overlay"-blend it with the color
+    # relief in one fused pass, instead of two full raster read/write
+    # cycles through gdal_calc
+    hillshade = gdal.Open(tmpHillshade).ReadAsArray().astype(
+        np.float32) * (0.5 / 255)
+    color = gdal.Open(tmpColorRelief).ReadAsArray().astype(np.float32) / 255
+
+    gdal.Unlink(tmpHillshade)
+    gdal.Unlink(tmpColorRelief)
+
+    merged = np.where(
+        hillshade < 0.5,
+        2 * hillshade * color,
+        1 - 2 * (1 - hillshade) * (1 - color)
+    )
+
     factor = 1.12  # Increase contrast
-    im_output = enhancer.enhance(factor)
-    im_output.save(tmpColoredHillshadeContrast)
+
+    # Contrast is applied in the same in-memory pass; PIL's ImageEnhance
+    # would decode and reencode the full tiff just for this affine op
+    merged = np.clip((merged * 255 - 128) * factor + 128,
+                     0, 255).astype(np.uint8)
+
+    driver = gdal.GetDriverByName('GTiff')
+    mergedDs = driver.Create(
+        tmpColoredHillshadeContrast, merged.shape[2], merged.shape[1], 3, gdal.GDT_Byte)
+
+    for band in range(3):
+        mergedDs.GetRasterBand(band + 1).WriteArray(merged[band])
+
+    mergedDs = None
 
     return tmpColoredHillshadeContrast
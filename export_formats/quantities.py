@@ -1,23 +1,18 @@
+import os
+
 import params as params
 
 
 def exportQuantities(self):
 
-    quantitiesPath = f'{params.output_folder_database_mdevalues}\\{self.outputFilename}.txt'
+    quantitiesPath = os.path.join(
+        params.output_folder_database_mdevalues, f'{self.outputFilename}.txt')
 
     print(f'-> Exporting quantities {quantitiesPath}')
 
-    colorValues = self.colorValues
-
-    quantities = []
-
-    i = 0
-    while i < len(params.styleDEM['palette']):
-        # Generating a color palette merging two structures
-        quantities.append(str(round(colorValues[i], 6)))
-        i += 1
-
-    string = f'{",".join(quantities)}'
+    # one quantity per palette entry, flushed in a single write
+    string = ','.join(str(round(colorValue, 6)) for colorValue,
+                      _ in zip(self.colorValues, params.styleDEM['palette']))
 
     fileQuantities = open(quantitiesPath, 'w')
     fileQuantities.write(string)
@@ -1,3 +1,4 @@
+import os
 from osgeo import gdal
 
 from helpers import addOverviews
@@ -41,29 +42,43 @@ def exportStorageDEM(self, file_ds):
             f'-> Changing noData value from {self.noDataValue} to {params.no_data}')
 
     if (warp):
-        tmpWarp = f'{TEMP_FOLDER}\\file_ds'
+        # per-file name: workers processing other files share the temp folder
+        tmpWarp = os.path.join(TEMP_FOLDER, f'{self.outputFilename}_file_ds')
         file_ds = gdal.Warp(tmpWarp, file_ds, **kwargs)
 
     kwargs = {
-        'format': 'GTiff',
         'xRes': params.storageDEM['gsd']/100 if params.storageDEM['gsd'] else self.pixelSizeX,
         'yRes': params.storageDEM['gsd']/100 if params.storageDEM['gsd'] else self.pixelSizeY,
         'bandList': [1],
-        'creationOptions': [
+        'metadataOptions': self.extra_metadata,
+        # to fix old error in Drone Deploy exports (https://gdal.org/programs/gdal_translate.html#cmdoption-gdal_translate-a_nodata)
+        'noData': 'none' if self.hasAlphaChannel else params.no_data
+    }
+
+    if (params.use_cog):
+        kwargs['format'] = 'COG'
+        kwargs['creationOptions'] = [
+            'COMPRESS=DEFLATE',
+            'PREDICTOR=3',  # floating point predictor
+            'BLOCKSIZE=512',
+            'NUM_THREADS=ALL_CPUS',
+            'BIGTIFF=IF_SAFER',
+            'OVERVIEWS=AUTO' if params.storageDEM['overviews'] else 'OVERVIEWS=NONE',
+        ]
+    else:
+        kwargs['format'] = 'GTiff'
+        kwargs['creationOptions'] = [
             'BIGTIFF=YES',  # for files larger than 4 GB
             'TFW=NO',
             'TILED=YES',  # forces the creation of a tiled output GeoTiff with default parameters
             'PHOTOMETRIC=MINISBLACK',
             'COMPRESS=DEFLATE',
-        ],
-        'metadataOptions': self.extra_metadata,
-        # to fix old error in Drone Deploy exports (https://gdal.org/programs/gdal_translate.html#cmdoption-gdal_translate-a_nodata)
-        'noData': 'none' if self.hasAlphaChannel else params.no_data
-    }
+        ]
 
     geotiff = gdal.Translate(gdaloutput, file_ds, **kwargs)
 
-    if params.storageDEM['overviews']:
+    # the COG driver already built its internal overviews
+    if params.storageDEM['overviews'] and not params.use_cog:
         addOverviews(geotiff)
 
     if params.storageDEM['gdalinfo']:
@@ -1,3 +1,4 @@
+import os
 from osgeo import gdal
 
 from helpers import addOverviews
@@ -38,7 +39,8 @@ def exportStorageRGB(self, file_ds):
             f'-> Changing noData value from {self.noDataValue} to {params.no_data}')
 
     if (warp):
-        tmpWarp = f'{TEMP_FOLDER}\\file_ds'
+        # per-file name: workers processing other files share the temp folder
+        tmpWarp = os.path.join(TEMP_FOLDER, f'{self.outputFilename}_file_ds')
         file_ds = gdal.Warp(tmpWarp, file_ds, **kwargs)
 
     kwargs = {
@@ -1,5 +1,6 @@
 import os
 import secrets
+import functools
 from pathlib import Path
 from datetime import datetime
 from osgeo import osr
@@ -11,6 +12,9 @@ import params as params
 
 TEMP_FOLDER = params.tmp_folder
 
+# in-memory raster, to skip one full disk write + read per file
+LIGHT_VERSION_TMP = '/vsimem/compressedLowRes.tif'
+
 
 def createFolder(folderPath):
     Path(folderPath).mkdir(
@@ -42,12 +46,20 @@ def getDateFromMetadata(file_ds):
         return None
 
 
-def getEPSGCode(file_ds):
-    prj = file_ds.GetProjection()
-    srs = osr.SpatialReference(wkt=prj)
+@functools.lru_cache(maxsize=16)
+def getEPSGFromWkt(wkt):
+    '''
+    osr.SpatialReference hits the PROJ database on every init, so the
+    lookup is cached: files in a batch usually share the same projection
+    '''
+    srs = osr.SpatialReference(wkt=wkt)
     return int(srs.GetAttrValue('AUTHORITY', 1))
 
 
+def getEPSGCode(file_ds):
+    return getEPSGFromWkt(file_ds.GetProjection())
+
+
 def cleanFilename(filename):
     '''
     Check if the filename has a dash and a version number. This occurs when
@@ -59,6 +71,22 @@ def cleanFilename(filename):
     return filename
 
 
+def getWarpMemoryLimit(file_ds):
+    '''
+    Size the warp working buffer so the multithreaded warper cuts the
+    raster into roughly 4 chunks per core. A single oversized chunk
+    leaves the other cores idle at the tail of the warp.
+    '''
+
+    targetChunks = 4 * (os.cpu_count() or 1)
+
+    # rough output estimate: source pixels at 4 bytes per band
+    rasterBytes = file_ds.RasterXSize * \
+        file_ds.RasterYSize * file_ds.RasterCount * 4
+
+    return max(64 << 20, rasterBytes // targetChunks)  # bytes
+
+
 def addOverviews(gdal_dataset):
     print('-> Adding overviews')
     '''
@@ -67,7 +95,40 @@ def addOverviews(gdal_dataset):
 
     This allow to speedup opening and viewing the files on QGis, Autocad, Geoserver, etc.
     '''
-    gdal_dataset.BuildOverviews("AVERAGE", params.overviews)
+
+    # Compress the overview levels; uncompressed pyramids can bloat the
+    # file size by ~50%. GDAL_NUM_THREADS (set at startup) parallelizes
+    # the resampling of each level. The options are (re)set per dataset
+    # because one worker processes several files
+    compression = gdal_dataset.GetMetadataItem(
+        'COMPRESSION', 'IMAGE_STRUCTURE')
+
+    if (compression and 'JPEG' in compression):
+        # photographic outputs: the overviews already inherit the jpeg
+        # compression of the base dataset, deflate would bloat them
+        gdal.SetConfigOption('COMPRESS_OVERVIEW', None)
+        gdal.SetConfigOption('PREDICTOR_OVERVIEW', None)
+    else:
+        isFloat = gdal_dataset.GetRasterBand(1).DataType in (
+            gdal.GDT_Float32, gdal.GDT_Float64)
+
+        gdal.SetConfigOption('COMPRESS_OVERVIEW', 'DEFLATE')
+        # floating point predictor for the elevation bands
+        gdal.SetConfigOption('PREDICTOR_OVERVIEW', '3' if isFloat else '2')
+
+    gdal.SetConfigOption('BIGTIFF_OVERVIEW', 'IF_SAFER')
+
+    # Only build the levels that still yield a useful pyramid size;
+    # on small rasters the deepest levels are near-1x1 tops that cost
+    # I/O without speeding anything up
+    width = gdal_dataset.RasterXSize
+    height = gdal_dataset.RasterYSize
+
+    levels = [level for level in params.overviews
+              if min(width, height) // level >= 256]
+
+    if (levels):
+        gdal_dataset.BuildOverviews("AVERAGE", levels)
 
 
 def createMapId():
@@ -78,6 +139,49 @@ def createMapId():
     return secrets.token_hex(nbytes=6)
 
 
+# Pixels kept in memory at once while evaluating the DEM percentiles.
+# Bigger rasters are uniformly subsampled down to roughly this amount
+MAX_DEM_SAMPLE = 50000000
+
+
+def readDEMValues(self, band):
+    '''
+    Read the band by blocks of rows, so memory stays O(block) instead of
+    O(raster). Rasters bigger than MAX_DEM_SAMPLE pixels are uniformly
+    decimated, which is enough for the percentile estimation.
+    '''
+
+    xsize = band.XSize
+    ysize = band.YSize
+
+    # strip-organized tiffs report 1-row blocks; read wider chunks
+    rows = max(band.GetBlockSize()[1], 256)
+
+    step = max(1, math.ceil(xsize * ysize / MAX_DEM_SAMPLE))
+
+    # float64 dem bands double the bytes moved for precision the color
+    # palette doesn't need
+    bufType = gdal.GDT_Float32 if params.styleDEM['use_float32'] else None
+
+    values = []
+
+    for yoff in range(0, ysize, rows):
+        # ravel() is a view, so the block is only copied once when filtering
+        block = band.ReadAsArray(
+            0, yoff, xsize, min(rows, ysize - yoff), buf_type=bufType).ravel()
+
+        # Remove NoDataValue, it doesn't mess up the percentage calculation
+        if (params.styleDEM['disregard_values_less_than_0']):
+            block = block[block >= 0]
+        else:
+            if (self.noDataValue != 'none'):
+                block = block[block != self.noDataValue]
+
+        values.append(block[::step])
+
+    return np.concatenate(values)
+
+
 def calculateDEMColorValues(self, geotiff):
     '''
     Creates a color palette scale to be exported as a .txt, using the elevation values
@@ -87,33 +191,24 @@ def calculateDEMColorValues(self, geotiff):
 
     print('-> Evaluating DEM values:')
 
-    array = np.array(geotiff.GetRasterBand(1).ReadAsArray())
-
-    array = np.array(array.flat)
-
-    # Remove NoDataValue, it doesn't mess up the percentage calculation
-    if (params.styleDEM['disregard_values_less_than_0']):
-        array = np.ma.masked_less(array, 0, False)
-        array = array.compressed()
-    else:
-        if (self.noDataValue != 'none'):
-            array = np.ma.masked_equal(array, self.noDataValue, False)
-            array = array.compressed()
+    array = readDEMValues(self, geotiff.GetRasterBand(1))
 
     # convert nan values no noData
     array = np.nan_to_num(array, nan=params.no_data)
 
-    # similar to "Cumulative cut count" (Qgis)
-    trimmedMin = np.percentile(
-        array,
-        params.styleDEM['min_percentile']
-    )
+    # similar to "Cumulative cut count" (Qgis). np.partition selects both
+    # quantiles in a single O(N) pass instead of one full sort per percentile
+    kMin = min(int(len(array) * params.styleDEM['min_percentile'] / 100),
+               len(array) - 1)
+    kMax = min(int(len(array) * params.styleDEM['max_percentile'] / 100),
+               len(array) - 1)
+
+    parted = np.partition(array, [kMin, kMax])
+
+    trimmedMin = parted[kMin]
     print('--> Trimmed Min:', trimmedMin)
 
-    trimmedMax = np.percentile(
-        array,
-        params.styleDEM['max_percentile']
-    )
+    trimmedMax = parted[kMax]
     print('--> Trimmed Max:', trimmedMax)
 
     if (math.isnan(trimmedMax) or math.isnan(trimmedMin)):
@@ -144,11 +239,8 @@ def getLightVersion(file_ds):
 
     print('-> Generating lightweight version')
 
-    # tmp file
-    tmpGeotiffCompressed = f'{params.tmp_folder}\\compressedLowRes.tif'
-
     geotiff = gdal.Warp(
-        tmpGeotiffCompressed,
+        LIGHT_VERSION_TMP,
         file_ds,
         **{
             'multithread': True,
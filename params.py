@@ -28,6 +28,12 @@ overviews = [2, 4, 8, 16, 32, 64, 128, 256]
 
 geoserver_epsg = 3857
 
+# Export Cloud-Optimized GeoTIFFs: tiling, compression and overviews are
+# created in one streaming pass instead of a plain write plus a re-read to
+# build the pyramids. The storage rgb version stays on plain GTiff because
+# the COG driver can't emit the .tfw sidecar
+use_cog = True
+
 # https://gdal.org/drivers/raster/gtiff.html#metadata
 metadata = [
     'TIFFTAG_ARTIST=Dirección Provincial de Hidráulica, Provincia de Buenos Aires'
@@ -99,6 +105,10 @@ styleDEM = {
     'min_percentile': 0.5,
     'max_percentile': 96,
 
+    # Read the elevation values as float32: halves the memory traffic of the
+    # percentile evaluation, with more than enough precision for the palette
+    'use_float32': True,
+
     # min to max
     'palette': [
         "#0000bb",
@@ -2,6 +2,7 @@ import sys
 import os
 import shutil
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import math
 
 import params as params
@@ -35,6 +36,24 @@ class ConvertGeotiff:
     '''
 
     def __init__(self):
+        # Allows GDAL to throw Python Exceptions
+        gdal.UseExceptions()
+
+        gdal.SetConfigOption('GDAL_TIFF_INTERNAL_MASK', 'YES')
+
+        # No "auxiliary metadata" sidecars (...aux.xml): one less small-file
+        # write + sync per export, and the jpg previews don't support them
+        gdal.SetConfigOption('GDAL_PAM_ENABLED', 'NO')
+
+        # multithreaded reads/writes for Translate and overview builds
+        gdal.SetConfigOption('GDAL_NUM_THREADS', 'ALL_CPUS')
+
+        # GDAL defaults to 5% of the RAM for its block cache, which thrashes
+        # on multi-GB orthomosaics. The workers running in parallel lower
+        # this back to 10% each (see processOneFile), keeping the total bounded
+        gdal.SetConfigOption('GDAL_CACHEMAX', '40%')
+
+    def run(self):
         print(f'SCRIPT Version: {__version__}')
 
         version_num = int(gdal.VersionInfo('VERSION_NUM'))
@@ -42,11 +61,6 @@ class ConvertGeotiff:
 
         print('OPERATION STARTED')
 
-        # Allows GDAL to throw Python Exceptions
-        gdal.UseExceptions()
-
-        gdal.SetConfigOption('GDAL_TIFF_INTERNAL_MASK', 'YES')
-
         self.checkDirectories()
         self.processTifs()
         self.clenTempFolder()
@@ -89,108 +103,135 @@ class ConvertGeotiff:
 
         processed = {}
 
-        # Find files in the input folder
-        for subdir, dirs, files in os.walk(params.input_folder):
-            is_subdir = subdir != params.input_folder
-            if(is_subdir):
-                continue
+        tasks = []
 
-            for file in files:
-                filepath = subdir + os.sep + file
-                if (h.getExtension(file) in params.extensions):
-                    try:
+        # Find files in the input folder. scandir reuses the stat info
+        # cached by the directory read, so unlike os.walk it doesn't pay
+        # an extra syscall per entry (slow on network shares)
+        with os.scandir(params.input_folder) as entries:
+            for entry in entries:
+                if (entry.is_file() and h.getExtension(entry.name) in params.extensions):
+                    tasks.append((entry.path, entry.name))
 
-                        print(f'--> PROCESSING FILE {file} <--')
+        # Resolve each file's mapId before submitting, so the rgb and dem
+        # versions of the same registro share the hash (see checkFileProcessed)
+        mapIds = {}
 
-                        file_ds = gdal.Open(filepath, gdal.GA_ReadOnly)
-                        # Number of bands
-                        bands = file_ds.RasterCount
-                        self.isDEM = bands <= 2
+        for filepath, file in tasks:
+            try:
+                file_ds = gdal.Open(filepath, gdal.GA_ReadOnly)
+                isDEM = file_ds.RasterCount <= 2
+                file_ds = None
+            except RuntimeError as e:
+                print(f'ERROR: Unable to process {filepath}')
+                print(e)
+                sys.exit(1)
 
-                        lastBand = file_ds.GetRasterBand(bands)
-                        self.hasAlphaChannel = (
-                            lastBand.GetColorInterpretation() == 6)  # https://github.com/rasterio/rasterio/issues/100
-                        self.noDataValue = lastBand.GetNoDataValue()  # take any band
+            filenameHasMapId = params.filename_prefix in file
 
-                        # Pix4DMatic injects an erroneous 'nan' value as noData attribute
-                        if ((self.noDataValue != None) and (math.isnan(self.noDataValue))):
-                            self.noDataValue = 0
+            if (isDEM):
+                self.mapId = h.removeExtension(file.split(
+                    params.filename_prefix)[1].split(params.dem_suffix)[0]) if filenameHasMapId else h.createMapId()
+            else:
+                self.mapId = h.removeExtension(
+                    file.split(params.filename_prefix)[1]) if filenameHasMapId else h.createMapId()
 
-                        filenameHasMapId = params.filename_prefix in file
+            if(not filenameHasMapId):
+                h.checkFileProcessed(self, isDEM, processed, file)
 
-                        if (self.isDEM):
+            mapIds[filepath] = self.mapId
 
-                            print(f'-> File {file} is DEM type')
+        # One process per file: GDAL is not thread-safe on shared datasets,
+        # so process-level parallelism is used to batch the conversions
+        max_workers = max(1, (os.cpu_count() or 2) // 2)
 
-                            # Generating output filename for DME case
-                            self.mapId = h.removeExtension(file.split(
-                                params.filename_prefix)[1].split(params.dem_suffix)[0]) if filenameHasMapId else h.createMapId()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(
+                processOneFile, filepath, file, mapIds[filepath]): filepath for filepath, file in tasks}
 
-                            if(not filenameHasMapId):
-                                h.checkFileProcessed(
-                                    self, True, processed, file)
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except RuntimeError as e:
+                    print(f'ERROR: Unable to process {futures[future]}')
+                    print(e)
+                    sys.exit(1)
 
-                            self.registroid = file.split(
-                                params.filename_prefix)[0] if filenameHasMapId else h.cleanFilename(h.removeExtension(file.split(params.dem_suffix)[0]))
-                        else:
+    def processFile(self, filepath, file, mapId):
 
-                            print(f'-> File {file} is RGB type')
+        print(f'--> PROCESSING FILE {file} <--')
 
-                            self.mapId = h.removeExtension(
-                                file.split(params.filename_prefix)[1]) if filenameHasMapId else h.createMapId()
+        file_ds = gdal.Open(filepath, gdal.GA_ReadOnly)
+        # Number of bands
+        bands = file_ds.RasterCount
+        self.isDEM = bands <= 2
 
-                            if(not filenameHasMapId):
-                                h.checkFileProcessed(
-                                    self, False, processed, file)
+        lastBand = file_ds.GetRasterBand(bands)
+        self.hasAlphaChannel = (
+            lastBand.GetColorInterpretation() == 6)  # https://github.com/rasterio/rasterio/issues/100
+        self.noDataValue = lastBand.GetNoDataValue()  # take any band
 
-                            self.registroid = file.split(
-                                "_")[0] if filenameHasMapId else h.cleanFilename(h.removeExtension(file))
+        # Pix4DMatic injects an erroneous 'nan' value as noData attribute
+        if ((self.noDataValue != None) and (math.isnan(self.noDataValue))):
+            self.noDataValue = 0
 
-                        output = f'{self.registroid}{params.filename_prefix}{self.mapId}'
+        filenameHasMapId = params.filename_prefix in file
 
-                        # Create parent folder for mapId
-                        self.outputFolder = f'{params.output_folder_storage}/{output}'
-                        h.createFolder(self.outputFolder)
+        self.mapId = mapId
 
-                        self.outputFilename = output if not self.isDEM else '{}{}'.format(
-                            output, params.dem_suffix)
+        if (self.isDEM):
 
-                        print(
-                            f'-> Files for {self.outputFilename} will be exported')
+            print(f'-> File {file} is DEM type')
 
-                        # File GSD
-                        gt = file_ds.GetGeoTransform()
-                        self.pixelSizeX = gt[1]
-                        self.pixelSizeY = -gt[5]
+            self.registroid = file.split(
+                params.filename_prefix)[0] if filenameHasMapId else h.cleanFilename(h.removeExtension(file.split(params.dem_suffix)[0]))
+        else:
 
-                        # file's GSD: get average x and y values
-                        self.originalGsd = round(
-                            (self.pixelSizeY + self.pixelSizeX) / 2 * 100, 2)  # cm
+            print(f'-> File {file} is RGB type')
 
-                        # File Projection
-                        self.epsg = h.getEPSGCode(file_ds)
+            self.registroid = file.split(
+                "_")[0] if filenameHasMapId else h.cleanFilename(h.removeExtension(file))
 
-                        self.date = h.getDateFromMetadata(file_ds)
+        output = f'{self.registroid}{params.filename_prefix}{self.mapId}'
 
-                        self.extra_metadata = params.metadata
+        # Create parent folder for mapId
+        self.outputFolder = f'{params.output_folder_storage}/{output}'
+        h.createFolder(self.outputFolder)
 
-                        self.extra_metadata.append(
-                            'registroId={}'.format(self.registroid))
+        self.outputFilename = output if not self.isDEM else '{}{}'.format(
+            output, params.dem_suffix)
 
-                        self.extra_metadata.append(
-                            'mapId={}'.format(self.mapId))
+        print(
+            f'-> Files for {self.outputFilename} will be exported')
 
-                        self.exportStorageFiles(file_ds)
+        # File GSD
+        gt = file_ds.GetGeoTransform()
+        self.pixelSizeX = gt[1]
+        self.pixelSizeY = -gt[5]
 
-                        self.exportGeoserverFiles(file_ds, file)
+        # file's GSD: get average x and y values
+        self.originalGsd = round(
+            (self.pixelSizeY + self.pixelSizeX) / 2 * 100, 2)  # cm
 
-                        # Once we're done, close properly the dataset
-                        file_ds = None
+        # File Projection
+        self.epsg = h.getEPSGCode(file_ds)
 
-                    except RuntimeError as e:
-                        print(f'ERROR: Unable to process {filepath}')
-                        print(e)
-                        sys.exit(1)
+        self.date = h.getDateFromMetadata(file_ds)
+
+        self.extra_metadata = params.metadata
+
+        self.extra_metadata.append(
+            'registroId={}'.format(self.registroid))
+
+        self.extra_metadata.append(
+            'mapId={}'.format(self.mapId))
+
+        self.exportStorageFiles(file_ds)
+
+        self.exportGeoserverFiles(file_ds, file)
+
+        # Once we're done, close properly the dataset
+        file_ds = None
 
     def exportStorageFiles(self, file_ds):
         '''
@@ -221,6 +262,8 @@ class ConvertGeotiff:
 
         compressedGeotiff = None
 
+        gdal.Unlink(h.LIGHT_VERSION_TMP)
+
     def exportGeoserverFiles(self, file_ds, file):
 
         print('EXPORTING GEOSERVER FILES')
@@ -238,4 +281,20 @@ class ConvertGeotiff:
             shutil.rmtree(params.tmp_folder)
 
 
-ConvertGeotiff()
+def processOneFile(filepath, file, mapId):
+    '''
+    Worker entry point: each file runs in its own process so every
+    worker gets a private GDAL handle and block cache
+    '''
+
+    converter = ConvertGeotiff()
+
+    # bound the aggregate memory while several workers run at once
+    gdal.SetConfigOption('GDAL_CACHEMAX', '10%')
+
+    converter.processFile(filepath, file, mapId)
+
+
+# guarded so the workers can safely re-import this module (Windows spawn)
+if __name__ == '__main__':
+    ConvertGeotiff().run()